@@ -63,19 +63,20 @@ export async function onRequestGet(context) {
       );
     }
 
-    // Normalize priceList → promotionPrice (mirrors _normalize_product in streaming_processor.py)
-    if (!product.promotionPrice) {
-      const priceList = product.priceList || [];
-      for (const entry of priceList) {
-        if (entry.priceType === "DISCOUNT") {
-          product.promotionPrice = { value: entry.value };
-          break;
-        }
+    // Read prices from priceList — first BUY entry is the original price,
+    // first DISCOUNT entry the sale price — falling back to the flat
+    // price/promotionPrice fields (mirrors process_product in streaming_processor.py)
+    let original_price = null;
+    let sale_price = null;
+    for (const entry of product.priceList || []) {
+      if (entry.priceType === "DISCOUNT" && sale_price === null) {
+        sale_price = safeFloat(entry);
+      } else if (entry.priceType === "BUY" && original_price === null) {
+        original_price = safeFloat(entry);
       }
     }
-
-    const original_price = safeFloat(product.price);
-    const sale_price = safeFloat(product.promotionPrice);
+    if (original_price === null) original_price = safeFloat(product.price);
+    if (sale_price === null) sale_price = safeFloat(product.promotionPrice);
 
     if (original_price === null) {
       return jsonResponse({ error: "Price data unavailable" }, 404);
@@ -0,0 +1,199 @@
+"""Shared helpers for calling the HKTVmall cate-search API."""
+
+import asyncio
+import logging
+import math
+import random
+import time
+from email.utils import parsedate_to_datetime
+
+import httpx
+
+from src.config import (
+    API_MAX_ATTEMPTS,
+    API_TIMEOUT,
+    CATE_SEARCH_API_URL,
+    PAGE_SIZE,
+    REQUEST_DELAY,
+    RETRY_BACKOFF_BASE,
+    RETRY_AFTER_MAX,
+    RETRY_BACKOFF_MAX,
+)
+
+log = logging.getLogger(__name__)
+
+API_HEADERS = {
+    "User-Agent": (
+        "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) "
+        "AppleWebKit/537.36 (KHTML, like Gecko) "
+        "Chrome/120.0.0.0 Safari/537.36"
+    ),
+    "Accept": "application/json, text/plain, */*",
+    "Origin": "https://www.hktvmall.com",
+    "Referer": "https://www.hktvmall.com/",
+}
+
+
+_client: httpx.AsyncClient | None = None
+
+
+def create_client() -> httpx.AsyncClient:
+    """Create an HTTP/2 client whose connection pool is shared by all fetches.
+
+    Connection failures are retried by the transport; HTTP error statuses
+    are left to the caller.
+    """
+    transport = httpx.AsyncHTTPTransport(
+        http2=True,
+        retries=2,
+        limits=httpx.Limits(
+            max_connections=64,
+            max_keepalive_connections=32,
+            keepalive_expiry=30,
+        ),
+    )
+    return httpx.AsyncClient(
+        headers=API_HEADERS,
+        timeout=httpx.Timeout(API_TIMEOUT / 1000),
+        transport=transport,
+    )
+
+
+def get_client() -> httpx.AsyncClient:
+    """Return the process-wide API client, creating it on first use.
+
+    Reusing one client keeps TLS sessions and pooled connections alive
+    across categories and runs instead of reconnecting each time.
+    """
+    global _client
+    if _client is None or _client.is_closed:
+        _client = create_client()
+    return _client
+
+
+async def close_client():
+    """Close the shared API client. Call before the event loop shuts down."""
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+
+class RateLimiter:
+    """Allow at most one request to start every `interval` seconds.
+
+    Shared by concurrent fetchers so that parallel page requests still
+    respect a single global request rate.
+
+    Usage:
+        await limiter.wait()
+        resp = await client.post(...)
+    """
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self._lock = asyncio.Lock()
+        self._next_slot = 0.0
+
+    async def wait(self):
+        """Block until this caller's request slot comes up.
+
+        The slot is re-checked after every sleep, so a pause() issued while
+        a caller is already waiting holds that caller back as well.
+        """
+        async with self._lock:
+            loop = asyncio.get_running_loop()
+            now = loop.time()
+            while self._next_slot > now:
+                await asyncio.sleep(self._next_slot - now)
+                now = loop.time()
+            self._next_slot = now + self.interval
+
+    def pause(self, seconds: float):
+        """Hold back every caller's next request for at least `seconds`."""
+        resume = asyncio.get_running_loop().time() + seconds
+        self._next_slot = max(self._next_slot, resume)
+
+
+# Single request-rate ceiling shared by every fetcher in the process
+rate_limiter = RateLimiter(REQUEST_DELAY)
+
+
+def _is_transient(status: int) -> bool:
+    return status == 408 or status == 429 or status >= 500
+
+
+def _retry_after(resp: httpx.Response) -> float | None:
+    """Seconds to wait from a 429/503 Retry-After header, capped at RETRY_AFTER_MAX."""
+    if resp.status_code not in (429, 503):
+        return None
+    value = resp.headers.get("retry-after")
+    if not value:
+        return None
+    try:
+        seconds = float(value)
+    except ValueError:
+        try:
+            retry_at = parsedate_to_datetime(value)
+        except (TypeError, ValueError):
+            return None
+        seconds = retry_at.timestamp() - time.time()
+    if not math.isfinite(seconds):
+        return None
+    return min(max(seconds, 0.0), RETRY_AFTER_MAX)
+
+
+async def post_with_retry(client: httpx.AsyncClient, url: str, params: dict, label: str) -> httpx.Response:
+    """POST to the API, retrying transient failures with exponential backoff.
+
+    Every attempt takes a slot from the shared rate limiter. Timeouts,
+    connection errors and 408/429/5xx responses are retried up to
+    API_MAX_ATTEMPTS tries in total, each retry first waiting a jittered,
+    doubling delay. A Retry-After header on 429/503 replaces that delay
+    and pauses the shared rate limiter, so every fetcher backs off rather
+    than only this one. Once attempts run out the last response is
+    returned (or its error re-raised) for the caller to handle.
+    """
+    server_paused = False
+    for attempt in range(1, API_MAX_ATTEMPTS + 1):
+        if attempt > 1 and not server_paused:
+            delay = min(RETRY_BACKOFF_MAX, RETRY_BACKOFF_BASE * 2 ** (attempt - 2))
+            await asyncio.sleep(random.uniform(delay / 2, delay))
+        await rate_limiter.wait()
+        server_paused = False
+
+        try:
+            resp = await client.post(url, params=params)
+        except httpx.TransportError as e:
+            if attempt == API_MAX_ATTEMPTS:
+                raise
+            log.warning("[%s] Request failed (%s), retrying (%d/%d)", label, e, attempt, API_MAX_ATTEMPTS)
+            continue
+
+        if attempt == API_MAX_ATTEMPTS or not _is_transient(resp.status_code):
+            return resp
+        retry_after = _retry_after(resp)
+        if retry_after is not None:
+            rate_limiter.pause(retry_after)
+            server_paused = True
+            log.warning(
+                "[%s] API returned status %d, retrying after %.1fs (%d/%d)",
+                label, resp.status_code, retry_after, attempt, API_MAX_ATTEMPTS,
+            )
+            continue
+        log.warning(
+            "[%s] API returned status %d, retrying (%d/%d)",
+            label, resp.status_code, attempt, API_MAX_ATTEMPTS,
+        )
+
+    raise AssertionError("unreachable")
+
+
+async def api_post(client: httpx.AsyncClient, query: str, page_num: int, label: str) -> httpx.Response:
+    """Request one page of a cate-search query, rate limited and retried."""
+    return await post_with_retry(
+        client,
+        CATE_SEARCH_API_URL,
+        params={"query": query, "currentPage": str(page_num), "pageSize": str(PAGE_SIZE)},
+        label=label,
+    )
@@ -9,6 +9,8 @@ DATA_DIR = PROJECT_ROOT / "data"
 RAW_PRODUCTS_PATH = DATA_DIR / "raw_products.json"
 DEALS_PATH = DATA_DIR / "deals.json"
 LAST_UPDATED_STATE_PATH = DATA_DIR / "last_updated_state.json"
+DEALS_JOURNAL_PATH = DATA_DIR / "deals.jsonl.partial"  # append-only, removed after a full run
+SCRAPE_CHECKPOINT_PATH = DATA_DIR / "scrape_checkpoint.json"  # resume state, removed after a full run
 
 # --- HKTVmall cate-search API ---
 CATE_SEARCH_API_URL = "https://cate-search.hktvmall.com/query/products"
@@ -31,9 +33,16 @@ CATEGORIES = {
 # --- Scraper settings ---
 PAGE_SIZE = 60  # max allowed by cate-search API
 MAX_PAGES = 250
-REQUEST_DELAY = 0.5  # seconds between API requests
+REQUEST_DELAY = 0.5  # min seconds between API request starts, across all fetchers
+PAGE_CONCURRENCY = 4  # max in-flight page requests per category
+CATEGORY_CONCURRENCY = 5  # max categories scraped at the same time
 API_TIMEOUT = 30_000  # ms
+API_MAX_ATTEMPTS = 3  # tries per request for timeouts, 408, 429 and 5xx
+RETRY_BACKOFF_BASE = 0.5  # seconds before the first retry; doubles each time
+RETRY_BACKOFF_MAX = 8.0  # cap on a single retry delay (seconds)
+RETRY_AFTER_MAX = 60.0  # cap on a server-requested Retry-After pause (seconds)
 UPLOAD_BATCH_SIZE = 50  # pages between intermediate R2 uploads
+CHECKPOINT_INTERVAL = 60  # min seconds between intermediate writes/uploads
 
 SCRAPE_CATEGORY = os.getenv("SCRAPE_CATEGORY", "both")  # 'dog', 'cat', or 'both'
 
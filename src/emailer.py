@@ -8,11 +8,16 @@ Usage:
     python -m src.emailer
 """
 
-import json
+import heapq
+import html
 import logging
 import smtplib
+import string
 from email.mime.multipart import MIMEMultipart
 from email.mime.text import MIMEText
+from operator import itemgetter
+
+import orjson
 
 from src.config import (
     DEALS_PATH,
@@ -38,58 +43,56 @@ def load_top_deals() -> tuple[list[dict], list[dict]]:
         log.error("Deals file not found: %s", DEALS_PATH)
         return [], []
 
-    with open(DEALS_PATH, "r", encoding="utf-8") as f:
-        deals = json.load(f)
-
-    dog_deals = [d for d in deals if d["category"] == "dog_food"]
-    cat_deals = [d for d in deals if d["category"] == "cat_food"]
+    deals = orjson.loads(DEALS_PATH.read_bytes())
 
-    # Already sorted by discount_pct descending from processor
-    return dog_deals[:TOP_N], cat_deals[:TOP_N]
+    # Select the top N directly rather than relying on the file's sort order
+    dog_deals = heapq.nlargest(
+        TOP_N,
+        (d for d in deals if d["category"] == "dog_food"),
+        key=itemgetter("discount_pct"),
+    )
+    cat_deals = heapq.nlargest(
+        TOP_N,
+        (d for d in deals if d["category"] == "cat_food"),
+        key=itemgetter("discount_pct"),
+    )
+    return dog_deals, cat_deals
 
 
-def _deal_row_html(deal: dict) -> str:
-    """Generate a single product row for the email."""
-    return f"""
+_DEAL_ROW_TEMPLATE = string.Template("""
     <tr style="border-bottom: 1px solid #eee;">
       <td style="padding: 12px 8px; width: 60px;">
-        <img src="{deal['image_url']}" alt="" width="56" height="56"
+        <img src="$image_url" alt="" width="56" height="56"
              style="border-radius: 4px; object-fit: cover;" />
       </td>
       <td style="padding: 12px 8px;">
-        <a href="{deal['product_url']}" style="color: #1a73e8; text-decoration: none; font-weight: 600;">
-          {deal['product_name']}
+        <a href="$product_url" style="color: #1a73e8; text-decoration: none; font-weight: 600;">
+          $product_name
         </a>
         <br/>
-        <span style="color: #666; font-size: 13px;">{deal['brand']}</span>
+        <span style="color: #666; font-size: 13px;">$brand</span>
       </td>
       <td style="padding: 12px 8px; text-align: right; white-space: nowrap;">
         <span style="text-decoration: line-through; color: #999; font-size: 13px;">
-          ${deal['original_price']:.2f}
+          $$$original_price
         </span>
         <br/>
         <span style="color: #d32f2f; font-weight: 700; font-size: 16px;">
-          ${deal['sale_price']:.2f}
+          $$$sale_price
         </span>
       </td>
       <td style="padding: 12px 8px; text-align: center;">
         <span style="background: #d32f2f; color: #fff; padding: 4px 10px;
                border-radius: 12px; font-size: 13px; font-weight: 700;">
-          -{deal['discount_pct']:.0f}%
+          -$discount_pct%
         </span>
       </td>
-    </tr>"""
-
+    </tr>""")
 
-def _section_html(title: str, deals: list[dict]) -> str:
-    """Generate an HTML table section for a category."""
-    if not deals:
-        return f"<h2 style='color: #333;'>{title}</h2><p>No deals found.</p>"
-
-    rows = "\n".join(_deal_row_html(d) for d in deals)
-    return f"""
+# Static table markup is rendered once; only the title and rows vary per section
+_SECTION_TEMPLATE = string.Template("""
     <h2 style="color: #333; border-bottom: 2px solid #1a73e8; padding-bottom: 8px;">
-      {title}
+      $title
     </h2>
     <table style="width: 100%; border-collapse: collapse; font-family: Arial, sans-serif; font-size: 14px;">
       <thead>
@@ -101,9 +104,31 @@ def _section_html(title: str, deals: list[dict]) -> str:
         </tr>
       </thead>
       <tbody>
-        {rows}
+        $rows
       </tbody>
-    </table>"""
+    </table>""")
+
+
+def _deal_row_html(deal: dict) -> str:
+    """Generate a single product row for the email."""
+    return _DEAL_ROW_TEMPLATE.substitute(
+        image_url=html.escape(deal["image_url"]),
+        product_url=html.escape(deal["product_url"]),
+        product_name=html.escape(deal["product_name"] or ""),
+        brand=html.escape(deal["brand"] or ""),
+        original_price=f"{deal['original_price']:.2f}",
+        sale_price=f"{deal['sale_price']:.2f}",
+        discount_pct=f"{deal['discount_pct']:.0f}",
+    )
+
+
+def _section_html(title: str, deals: list[dict]) -> str:
+    """Generate an HTML table section for a category."""
+    if not deals:
+        return f"<h2 style='color: #333;'>{title}</h2><p>No deals found.</p>"
+
+    rows = "".join(_deal_row_html(d) for d in deals)
+    return _SECTION_TEMPLATE.substitute(title=title, rows=rows)
 
 
 def build_email_html(dog_deals: list[dict], cat_deals: list[dict]) -> str:
@@ -142,9 +167,16 @@ def build_email_html(dog_deals: list[dict], cat_deals: list[dict]) -> str:
     </html>"""
 
 
-def send_email():
-    """Build and send the weekly deal digest email."""
-    if not all([EMAIL_SENDER, EMAIL_PASSWORD, EMAIL_RECIPIENT]):
+def send_email(recipients: list[str] | None = None):
+    """Build and send the weekly deal digest email.
+
+    Defaults to the comma-separated EMAIL_RECIPIENT list. All recipients
+    receive the same message over one SMTP session in a single transaction.
+    """
+    if recipients is None:
+        recipients = [r.strip() for r in EMAIL_RECIPIENT.split(",") if r.strip()]
+
+    if not all([EMAIL_SENDER, EMAIL_PASSWORD, recipients]):
         log.error(
             "Email credentials not configured. Set EMAIL_SENDER, EMAIL_PASSWORD, "
             "and EMAIL_RECIPIENT environment variables."
@@ -156,13 +188,15 @@ def send_email():
         log.warning("No deals to send.")
         return False
 
-    html = build_email_html(dog_deals, cat_deals)
+    html_body = build_email_html(dog_deals, cat_deals)
 
     msg = MIMEMultipart("alternative")
     msg["Subject"] = "Weekly HKTVmall Pet Food Deals"
     msg["From"] = EMAIL_SENDER
-    msg["To"] = EMAIL_RECIPIENT
-    msg.attach(MIMEText(html, "html"))
+    # Recipients are only in the SMTP envelope (to_addrs below) so that
+    # subscribers do not see each other's addresses
+    msg["To"] = "undisclosed-recipients:;"
+    msg.attach(MIMEText(html_body, "html"))
 
     try:
         with smtplib.SMTP(SMTP_HOST, SMTP_PORT) as server:
@@ -170,8 +204,9 @@ def send_email():
             server.starttls()
             server.ehlo()
             server.login(EMAIL_SENDER, EMAIL_PASSWORD)
-            server.sendmail(EMAIL_SENDER, [EMAIL_RECIPIENT], msg.as_string())
-        log.info("Email sent successfully to %s", EMAIL_RECIPIENT)
+            # One DATA command with an RCPT TO per recipient
+            server.send_message(msg, from_addr=EMAIL_SENDER, to_addrs=recipients)
+        log.info("Email sent successfully to %s", ", ".join(recipients))
         return True
     except Exception as e:
         log.error("Failed to send email: %s", e, exc_info=True)
@@ -8,10 +8,13 @@ Usage:
     python -m src.processor
 """
 
-import json
 import logging
 import re
 from datetime import date
+from operator import itemgetter
+
+import ijson
+import orjson
 
 from src.config import BASE_URL, DEALS_PATH, RAW_PRODUCTS_PATH
 
@@ -34,6 +37,13 @@ def _safe_float(obj: dict | None, key: str = "value") -> float | None:
         return None
 
 
+# Weight patterns, compiled once and tried in order by _extract_weight
+_KG_RE = re.compile(r'(\d+(?:\.\d+)?)\s*(?:kg|kgs|公斤|千克)', re.IGNORECASE)
+_LB_RE = re.compile(r'(\d+(?:\.\d+)?)\s*(?:lb|lbs|磅)', re.IGNORECASE)
+_OZ_RE = re.compile(r'(\d+(?:\.\d+)?)\s*(?:oz|安士)', re.IGNORECASE)
+_G_RE = re.compile(r'(\d+(?:\.\d+)?)\s*(?:g|gram|grams|克)(?!\w)', re.IGNORECASE)
+
+
 def _extract_weight(text: str) -> float | None:
     """Extract weight from product text and return in grams.
 
@@ -44,22 +54,22 @@ def _extract_weight(text: str) -> float | None:
         return None
 
     # Try kg first (e.g., "1.18千克", "2.7kg", "6lb/2.7kg")
-    match = re.search(r'(\d+(?:\.\d+)?)\s*(?:kg|kgs|公斤|千克)', text, re.IGNORECASE)
+    match = _KG_RE.search(text)
     if match:
         return float(match.group(1)) * 1000  # convert to grams
 
     # Try lb (e.g., "4 lb", "6lb", "4lb")
-    match = re.search(r'(\d+(?:\.\d+)?)\s*(?:lb|lbs|磅)', text, re.IGNORECASE)
+    match = _LB_RE.search(text)
     if match:
         return float(match.group(1)) * 453.592  # convert to grams
 
     # Try oz (e.g., "4.5oz", "12 oz")
-    match = re.search(r'(\d+(?:\.\d+)?)\s*(?:oz|安士)', text, re.IGNORECASE)
+    match = _OZ_RE.search(text)
     if match:
         return float(match.group(1)) * 28.3495  # convert to grams
 
     # Try g standalone (e.g., "85g", "300 g")
-    match = re.search(r'(\d+(?:\.\d+)?)\s*(?:g|gram|grams|克)(?!\w)', text, re.IGNORECASE)
+    match = _G_RE.search(text)
     if match:
         return float(match.group(1))
 
@@ -130,34 +140,35 @@ def run_processor():
         log.error("Run the scraper first: python -m src.scraper")
         return []
 
-    with open(RAW_PRODUCTS_PATH, "r", encoding="utf-8") as f:
-        raw_products = json.load(f)
-
-    log.info("Loaded %d raw products", len(raw_products))
-
     scraped_date = date.today().isoformat()
     deals: list[dict] = []
     seen_codes: set[str] = set()
-
-    for raw in raw_products:
-        deal = process_product(raw, scraped_date)
-        if deal is None:
-            continue
-        code = deal["product_code"]
-        if code and code in seen_codes:
-            continue
-        if code:
-            seen_codes.add(code)
-        deals.append(deal)
+    raw_count = 0
+
+    # Stream products one at a time instead of materializing the whole file
+    with open(RAW_PRODUCTS_PATH, "rb") as f:
+        for raw in ijson.items(f, "item", use_float=True):
+            raw_count += 1
+            # Skip known duplicates before doing the per-product work
+            code = raw.get("code", "")
+            if code and code in seen_codes:
+                continue
+            deal = process_product(raw, scraped_date)
+            if deal is None:
+                continue
+            if code:
+                seen_codes.add(code)
+            deals.append(deal)
+
+    log.info("Loaded %d raw products", raw_count)
 
     # Sort by discount descending
-    deals.sort(key=lambda d: d["discount_pct"], reverse=True)
+    deals.sort(key=itemgetter("discount_pct"), reverse=True)
 
     log.info("Processed %d deals with discounts", len(deals))
 
     DEALS_PATH.parent.mkdir(parents=True, exist_ok=True)
-    with open(DEALS_PATH, "w", encoding="utf-8") as f:
-        json.dump(deals, f, ensure_ascii=False, indent=2)
+    DEALS_PATH.write_bytes(orjson.dumps(deals, option=orjson.OPT_INDENT_2))
 
     log.info("Deals saved to %s", DEALS_PATH)
     return deals
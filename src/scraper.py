@@ -2,27 +2,25 @@
 Scraper that fetches HKTVmall product data via the cate-search API.
 
 Calls the cate-search.hktvmall.com/query/products endpoint directly
-using Playwright's request API, paginating through all results.
+using an HTTP/2 httpx client, paginating through all results.
 
 Usage:
     python -m src.scraper
 """
 
 import asyncio
-import json
 import logging
 
-from playwright.async_api import async_playwright
+import orjson
 
+from src.api_client import api_post, close_client, get_client
 from src.config import (
-    API_TIMEOUT,
-    CATE_SEARCH_API_URL,
     CATEGORIES,
+    CATEGORY_CONCURRENCY,
     DATA_DIR,
     MAX_PAGES,
-    PAGE_SIZE,
+    PAGE_CONCURRENCY,
     RAW_PRODUCTS_PATH,
-    REQUEST_DELAY,
 )
 
 logging.basicConfig(
@@ -50,7 +48,7 @@ def _normalize_product(product: dict) -> dict:
     return product
 
 
-async def scrape_category(api_context, category_key: str, category_info: dict) -> list[dict]:
+async def scrape_category(client, category_key: str, category_info: dict) -> list[dict]:
     """Scrape all products for a single category via direct API calls."""
     label = category_info["label"]
     query = category_info["query"]
@@ -59,20 +57,20 @@ async def scrape_category(api_context, category_key: str, category_info: dict) -
     # --- Page 0 ---
     log.info("[%s] Fetching page 0...", label)
     try:
-        resp = await api_context.post(
-            CATE_SEARCH_API_URL,
-            params={"query": query, "currentPage": "0", "pageSize": str(PAGE_SIZE)},
-            timeout=API_TIMEOUT,
-        )
+        resp = await api_post(client, query, 0, label)
     except Exception as e:
         log.error("[%s] API request failed on page 0: %s", label, e)
         return all_products
 
-    if resp.status != 200:
-        log.error("[%s] API returned status %d on page 0", label, resp.status)
+    if resp.status_code != 200:
+        log.error("[%s] API returned status %d on page 0", label, resp.status_code)
         return all_products
 
-    data = await resp.json()
+    try:
+        data = orjson.loads(resp.content)
+    except orjson.JSONDecodeError as e:
+        log.error("[%s] Invalid JSON on page 0: %s", label, e)
+        return all_products
     pagination = data.get("pagination", {})
     total_pages = pagination.get("numberOfPages", 1)
     total_results = pagination.get("totalNumberOfResults", 0)
@@ -85,41 +83,51 @@ async def scrape_category(api_context, category_key: str, category_info: dict) -
     all_products.extend(products)
     log.info("[%s] Page 0: fetched %d products", label, len(products))
 
-    # --- Remaining pages ---
+    # --- Remaining pages (fetched concurrently, paced by the global rate limiter) ---
     pages_to_scrape = min(total_pages, MAX_PAGES)
-    for page_num in range(1, pages_to_scrape):
-        await asyncio.sleep(REQUEST_DELAY)
-
-        log.info("[%s] Fetching page %d/%d...", label, page_num, pages_to_scrape - 1)
-        try:
-            resp = await api_context.post(
-                CATE_SEARCH_API_URL,
-                params={
-                    "query": query,
-                    "currentPage": str(page_num),
-                    "pageSize": str(PAGE_SIZE),
-                },
-                timeout=API_TIMEOUT,
-            )
-        except Exception as e:
-            log.warning("[%s] API request failed on page %d: %s", label, page_num, e)
-            continue
-
-        if resp.status != 200:
-            log.warning("[%s] API returned status %d on page %d", label, resp.status, page_num)
-            continue
-
-        data = await resp.json()
+    page_sem = asyncio.Semaphore(PAGE_CONCURRENCY)
+    stop_at = pages_to_scrape  # first page found empty; later pages are skipped
+
+    async def fetch_page(page_num: int) -> list[dict]:
+        nonlocal stop_at
+        async with page_sem:
+            if page_num >= stop_at:
+                return []
+            log.info("[%s] Fetching page %d/%d...", label, page_num, pages_to_scrape - 1)
+            try:
+                resp = await api_post(client, query, page_num, label)
+            except Exception as e:
+                log.warning("[%s] API request failed on page %d: %s", label, page_num, e)
+                return []
+
+            if resp.status_code != 200:
+                log.warning("[%s] API returned status %d on page %d", label, resp.status_code, page_num)
+                return []
+
+            try:
+                data = orjson.loads(resp.content)
+            except orjson.JSONDecodeError as e:
+                log.warning("[%s] Invalid JSON on page %d: %s", label, page_num, e)
+                return []
+
         products = data.get("products", [])
         if not products:
             log.info("[%s] No more products at page %d, stopping", label, page_num)
-            break
+            stop_at = min(stop_at, page_num)
+            return []
 
         for p in products:
             _normalize_product(p)
             p["_category"] = category_key
+        log.info("[%s] Page %d: fetched %d products", label, page_num, len(products))
+        return products
+
+    pages = await asyncio.gather(*(fetch_page(n) for n in range(1, pages_to_scrape)))
+    for page_num, products in enumerate(pages, start=1):
+        if page_num >= stop_at:
+            break
         all_products.extend(products)
-        log.info("[%s] Page %d: fetched %d products (total: %d)", label, page_num, len(products), len(all_products))
+    log.info("[%s] Fetched %d products in total", label, len(all_products))
 
     return all_products
 
@@ -130,46 +138,42 @@ async def run_scraper():
 
     all_products: list[dict] = []
 
-    async with async_playwright() as pw:
-        api_context = await pw.request.new_context(
-            extra_http_headers={
-                "User-Agent": (
-                    "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) "
-                    "AppleWebKit/537.36 (KHTML, like Gecko) "
-                    "Chrome/120.0.0.0 Safari/537.36"
-                ),
-                "Accept": "application/json, text/plain, */*",
-                "Origin": "https://www.hktvmall.com",
-                "Referer": "https://www.hktvmall.com/",
-            }
-        )
+    client = get_client()
+    try:
+        category_sem = asyncio.Semaphore(CATEGORY_CONCURRENCY)
 
-        for cat_key, cat_info in CATEGORIES.items():
-            try:
-                products = await scrape_category(api_context, cat_key, cat_info)
-                all_products.extend(products)
-            except Exception as e:
-                log.error("Failed to scrape %s: %s", cat_key, e, exc_info=True)
+        async def scrape_bounded(cat_key: str, cat_info: dict) -> list[dict]:
+            async with category_sem:
+                return await scrape_category(client, cat_key, cat_info)
 
-        await api_context.dispose()
+        results = await asyncio.gather(
+            *(scrape_bounded(k, v) for k, v in CATEGORIES.items()),
+            return_exceptions=True,
+        )
+        for cat_key, result in zip(CATEGORIES, results):
+            if isinstance(result, BaseException):
+                log.error("Failed to scrape %s: %s", cat_key, result, exc_info=result)
+                continue
+            all_products.extend(result)
 
-    log.info("Total raw products captured: %d", len(all_products))
+        log.info("Total raw products captured: %d", len(all_products))
 
-    # Save raw data
-    RAW_PRODUCTS_PATH.parent.mkdir(parents=True, exist_ok=True)
-    with open(RAW_PRODUCTS_PATH, "w", encoding="utf-8") as f:
-        json.dump(all_products, f, ensure_ascii=False, indent=2)
+        # Save raw data
+        RAW_PRODUCTS_PATH.parent.mkdir(parents=True, exist_ok=True)
+        RAW_PRODUCTS_PATH.write_bytes(orjson.dumps(all_products, option=orjson.OPT_INDENT_2))
 
-    log.info("Raw products saved to %s", RAW_PRODUCTS_PATH)
-    return all_products
+        log.info("Raw products saved to %s", RAW_PRODUCTS_PATH)
+        return all_products
+    finally:
+        await close_client()
 
 
 def main():
     """Run the scraper using streaming processor for memory efficiency."""
-    from src.streaming_processor import run_streaming_processor
+    from src.streaming_processor import main as run_streaming_main
 
     log.info("Using streaming processor for batch-by-batch processing")
-    asyncio.run(run_streaming_processor())
+    run_streaming_main()
 
 
 if __name__ == "__main__":
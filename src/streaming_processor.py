@@ -2,37 +2,43 @@
 Streaming processor: fetch → process → deduplicate → write.
 
 Processes products page-by-page to minimize memory usage.
-Deduplicates globally across all categories.
+Deduplicates globally across all categories as each page is processed.
 Writes atomically to deals.json.
 
 Usage:
     python -m src.streaming_processor
 """
 
+import argparse
 import asyncio
-import json
+import hashlib
 import logging
 import os
 import re
-import shutil
 import tempfile
+import time
 from datetime import date
+from operator import itemgetter
 from pathlib import Path
+from sys import intern
+from typing import BinaryIO
 
-from playwright.async_api import async_playwright
+import orjson
 
+from src.api_client import api_post, close_client, get_client
 from src.config import (
-    API_TIMEOUT,
     BASE_URL,
-    CATE_SEARCH_API_URL,
     CATEGORIES,
+    CATEGORY_CONCURRENCY,
+    CHECKPOINT_INTERVAL,
     DATA_DIR,
+    DEALS_JOURNAL_PATH,
     DEALS_PATH,
     LAST_UPDATED_STATE_PATH,
     MAX_PAGES,
-    PAGE_SIZE,
-    REQUEST_DELAY,
+    PAGE_CONCURRENCY,
     SCRAPE_CATEGORY,
+    SCRAPE_CHECKPOINT_PATH,
     UPLOAD_BATCH_SIZE,
 )
 
@@ -42,6 +48,11 @@ try:
 except ImportError:
     boto3 = None
 
+try:
+    import uvloop
+except ImportError:
+    uvloop = None
+
 logging.basicConfig(
     level=logging.INFO,
     format="%(asctime)s [%(levelname)s] %(message)s",
@@ -61,50 +72,56 @@ def _safe_float(obj: dict | None, key: str = "value") -> float | None:
         return None
 
 
+# Weight patterns, compiled once and tried in order by _extract_weight
+_KG_RE = re.compile(r'(\d+(?:\.\d+)?)\s*(?:kg|kgs|公斤|千克)', re.IGNORECASE)
+_LB_RE = re.compile(r'(\d+(?:\.\d+)?)\s*(?:lb|lbs|磅)', re.IGNORECASE)
+_OZ_RE = re.compile(r'(\d+(?:\.\d+)?)\s*(?:oz|安士)', re.IGNORECASE)
+_G_RE = re.compile(r'(\d+(?:\.\d+)?)\s*(?:g|gram|grams|克)(?!\w)', re.IGNORECASE)
+
+
 def _extract_weight(text: str) -> float | None:
     """Extract weight from product text and return in grams."""
     if not text:
         return None
-    match = re.search(r'(\d+(?:\.\d+)?)\s*(?:kg|kgs|公斤|千克)', text, re.IGNORECASE)
+    match = _KG_RE.search(text)
     if match:
         return float(match.group(1)) * 1000
-    match = re.search(r'(\d+(?:\.\d+)?)\s*(?:lb|lbs|磅)', text, re.IGNORECASE)
+    match = _LB_RE.search(text)
     if match:
         return float(match.group(1)) * 453.592
-    match = re.search(r'(\d+(?:\.\d+)?)\s*(?:oz|安士)', text, re.IGNORECASE)
+    match = _OZ_RE.search(text)
     if match:
         return float(match.group(1)) * 28.3495
-    match = re.search(r'(\d+(?:\.\d+)?)\s*(?:g|gram|grams|克)(?!\w)', text, re.IGNORECASE)
+    match = _G_RE.search(text)
     if match:
         return float(match.group(1))
     return None
 
 
-def _normalize_product(product: dict) -> dict:
-    """Add promotionPrice from priceList for processor compatibility.
-
-    The cate-search API returns prices in priceList (BUY + DISCOUNT entries)
-    rather than separate price/promotionPrice fields.
-    """
-    price_list = product.get("priceList", [])
-    for entry in price_list:
-        if entry.get("priceType") == "DISCOUNT":
-            product["promotionPrice"] = {
-                "currencyIso": entry.get("currencyIso", "HKD"),
-                "value": entry.get("value"),
-                "formattedValue": entry.get("formattedValue", ""),
-            }
-            break
-    return product
-
-
-def process_product(raw: dict, scraped_date: str) -> dict | None:
+def process_product(raw: dict, category_key: str, scraped_date: str) -> dict | None:
     """Convert a raw AJAX product dict into a deal record.
 
+    The raw dict is only read, never modified.
+
+    Prices are read straight from priceList (the cate-search API's BUY and
+    DISCOUNT entries), falling back to the flat price/promotionPrice fields.
+
     Returns None if the product has no discount or is missing required fields.
     """
-    original_price = _safe_float(raw.get("price"))
-    sale_price = _safe_float(raw.get("promotionPrice"))
+    get = raw.get  # bound once; this runs for every product on every page
+    original_price = sale_price = None
+    for entry in get("priceList") or ():
+        price_type = entry.get("priceType")
+        if price_type == "DISCOUNT":
+            if sale_price is None:
+                sale_price = _safe_float(entry)
+        elif price_type == "BUY":
+            if original_price is None:
+                original_price = _safe_float(entry)
+    if original_price is None:
+        original_price = _safe_float(get("price"))
+    if sale_price is None:
+        sale_price = _safe_float(get("promotionPrice"))
 
     if original_price is None or sale_price is None:
         return None
@@ -116,38 +133,42 @@ def process_product(raw: dict, scraped_date: str) -> dict | None:
     discount_pct = round((original_price - sale_price) / original_price * 100, 2)
 
     # Build image URL
-    images = raw.get("images", [])
+    images = get("images")
     image_url = ""
     if images:
-        img = images[0].get("url", "")
-        if img.startswith("//"):
-            img = "https:" + img
-        image_url = img
+        image_url = images[0].get("url", "")
+        if image_url.startswith("//"):
+            image_url = "https:" + image_url
 
     # Build product URL
-    product_url = raw.get("url", "")
+    product_url = get("url", "")
     if product_url and not product_url.startswith("http"):
         product_url = BASE_URL + product_url.lstrip("/")
 
     # Stock status
-    stock_info = raw.get("stock", {})
-    stock_status = stock_info.get("stockLevelStatus", {})
-    in_stock = stock_status.get("code", "") == "inStock"
-    weight_text = " ".join(
-        str(raw.get(key) or "")
-        for key in ("packingSpec", "name", "summary", "description")
+    stock_status = (get("stock") or {}).get("stockLevelStatus") or {}
+    in_stock = stock_status.get("code") == "inStock"
+
+    # Brands repeat across thousands of deals; share one string per brand
+    brand = get("brandName", "")
+    if isinstance(brand, str):
+        brand = intern(brand)
+
+    product_name = get("name", "")
+    weight_text = (
+        f"{get('packingSpec') or ''} {product_name or ''} "
+        f"{get('summary') or ''} {get('description') or ''}"
     )
 
-    product_name = raw.get("name", "")
     return {
-        "product_code": raw.get("code", ""),
+        "product_code": get("code", ""),
         "product_name": product_name,
-        "brand": raw.get("brandName", ""),
+        "brand": brand,
         "original_price": original_price,
         "sale_price": sale_price,
         "discount_pct": discount_pct,
         "weight_grams": _extract_weight(weight_text),
-        "category": raw.get("_category", "unknown"),
+        "category": category_key,
         "image_url": image_url,
         "product_url": product_url,
         "in_stock": in_stock,
@@ -155,8 +176,13 @@ def process_product(raw: dict, scraped_date: str) -> dict | None:
     }
 
 
-def atomic_write_json(path: Path, data: list[dict]):
-    """Write JSON atomically using temp file + rename."""
+def atomic_write_json(path: Path, data: list[dict], pretty: bool = False, verify: bool = False):
+    """Write JSON atomically using temp file + fsync + rename.
+
+    Output is compact unless pretty is set, which indents by two spaces.
+    With verify, the temp file is read back and its SHA-256 checked against
+    what was written before it replaces the target.
+    """
     # Ensure parent directory exists
     path.parent.mkdir(parents=True, exist_ok=True)
 
@@ -167,13 +193,43 @@ def atomic_write_json(path: Path, data: list[dict]):
         suffix=".tmp"
     )
 
-    try:
-        # Write JSON to temp file
-        with os.fdopen(temp_fd, 'w', encoding='utf-8') as f:
-            json.dump(data, f, ensure_ascii=False, indent=2)
+    digest = hashlib.sha256() if verify else None
 
-        # Atomic rename (works on both POSIX and Windows)
-        shutil.move(temp_path, path)
+    try:
+        # Stream deals into the temp file one at a time so the whole
+        # document is never serialized in memory. The layout matches a
+        # single orjson dump of the list (with OPT_INDENT_2 when pretty).
+        with os.fdopen(temp_fd, 'wb') as f:
+            def write(chunk: bytes):
+                f.write(chunk)
+                if digest is not None:
+                    digest.update(chunk)
+
+            write(b"[")
+            if pretty:
+                for i, deal in enumerate(data):
+                    write(b",\n  " if i else b"\n  ")
+                    write(orjson.dumps(deal, option=orjson.OPT_INDENT_2).replace(b"\n", b"\n  "))
+                write(b"\n]" if data else b"]")
+            else:
+                for i, deal in enumerate(data):
+                    if i:
+                        write(b",")
+                    write(orjson.dumps(deal))
+                write(b"]")
+
+            # Make the data durable before the rename makes it visible;
+            # otherwise a crash can leave an empty deals.json behind
+            f.flush()
+            os.fsync(f.fileno())
+
+        if digest is not None:
+            on_disk = hashlib.sha256(Path(temp_path).read_bytes()).hexdigest()
+            if on_disk != digest.hexdigest():
+                raise OSError(f"SHA-256 mismatch in {temp_path}")
+
+        # Atomic rename on the same filesystem (POSIX and Windows)
+        os.replace(temp_path, path)
         log.info(f"Atomically wrote {len(data)} deals to {path}")
 
     except Exception as e:
@@ -191,11 +247,10 @@ def load_previous_deals() -> dict[str, dict]:
     """
     if LAST_UPDATED_STATE_PATH.exists():
         try:
-            with open(LAST_UPDATED_STATE_PATH, "r", encoding="utf-8") as f:
-                state = json.load(f)
+            state = orjson.loads(LAST_UPDATED_STATE_PATH.read_bytes())
             log.info(f"Loaded {len(state)} previous items from last_updated_state.json")
             return state
-        except (json.JSONDecodeError, KeyError) as e:
+        except (orjson.JSONDecodeError, KeyError) as e:
             log.warning(f"Failed to load last_updated_state.json: {e}")
 
     if not DEALS_PATH.exists():
@@ -203,12 +258,11 @@ def load_previous_deals() -> dict[str, dict]:
         return {}
 
     try:
-        with open(DEALS_PATH, "r", encoding="utf-8") as f:
-            previous = json.load(f)
+        previous = orjson.loads(DEALS_PATH.read_bytes())
         lookup = {d["product_code"]: d for d in previous if d.get("product_code")}
         log.info(f"Loaded {len(lookup)} previous deals from deals.json (legacy fallback)")
         return lookup
-    except (json.JSONDecodeError, KeyError) as e:
+    except (orjson.JSONDecodeError, KeyError) as e:
         log.warning(f"Failed to load deals.json: {e}")
         return {}
 
@@ -226,40 +280,106 @@ def save_last_updated_state(deals: list[dict]):
         if d.get("product_code")
     }
     LAST_UPDATED_STATE_PATH.parent.mkdir(parents=True, exist_ok=True)
-    with open(LAST_UPDATED_STATE_PATH, "w", encoding="utf-8") as f:
-        json.dump(state, f, ensure_ascii=False, separators=(",", ":"))
+    LAST_UPDATED_STATE_PATH.write_bytes(orjson.dumps(state))
     log.info(f"Saved {len(state)} items to last_updated_state.json")
 
 
-def apply_last_updated(
-    deals: list[dict],
+def load_checkpoint(scraped_date: str) -> dict | None:
+    """Load the resume checkpoint left by an interrupted run today.
+
+    A checkpoint is only usable together with the deals journal it
+    describes, and only on the same day (prices from an earlier day are
+    stale). Returns None if there is nothing to resume.
+    """
+    if not SCRAPE_CHECKPOINT_PATH.exists() or not DEALS_JOURNAL_PATH.exists():
+        return None
+    try:
+        checkpoint = orjson.loads(SCRAPE_CHECKPOINT_PATH.read_bytes())
+    except orjson.JSONDecodeError as e:
+        log.warning(f"Ignoring unreadable checkpoint: {e}")
+        return None
+    if checkpoint.get("scraped_date") != scraped_date:
+        log.info(f"Ignoring checkpoint from {checkpoint.get('scraped_date')}")
+        return None
+    return checkpoint
+
+
+def save_checkpoint(scraped_date: str, done_pages: dict[str, set[int]]):
+    """Atomically record which (category, page) pairs are already journaled."""
+    checkpoint = {
+        "scraped_date": scraped_date,
+        "pages": {k: sorted(v) for k, v in done_pages.items()},
+    }
+    SCRAPE_CHECKPOINT_PATH.parent.mkdir(parents=True, exist_ok=True)
+    temp_path = SCRAPE_CHECKPOINT_PATH.with_name(SCRAPE_CHECKPOINT_PATH.name + ".tmp")
+    temp_path.write_bytes(orjson.dumps(checkpoint))
+    os.replace(temp_path, SCRAPE_CHECKPOINT_PATH)
+
+
+def load_journal() -> dict[str, dict]:
+    """Reload the deals journaled by an interrupted run, keyed by product_code.
+
+    A torn final line (the run died mid-write) is cut off so that new
+    lines can be appended cleanly.
+    """
+    raw = DEALS_JOURNAL_PATH.read_bytes()
+    end = raw.rfind(b"\n") + 1
+    if end < len(raw):
+        with open(DEALS_JOURNAL_PATH, "r+b") as f:
+            f.truncate(end)
+
+    deals_by_code: dict[str, dict] = {}
+    for line in raw[:end].splitlines():
+        deal = orjson.loads(line)
+        deals_by_code.setdefault(deal["product_code"], deal)
+    return deals_by_code
+
+
+def finalize(
+    deals_by_code: dict[str, dict],
     previous_lookup: dict[str, dict],
     scraped_date: str,
 ) -> list[dict]:
-    """Set last_updated on each deal by comparing with previous data."""
+    """Set last_updated on every deal and return them sorted by discount.
+
+    last_updated is carried over from the previous data unless the item is
+    new or its original_price, sale_price or in_stock changed. One pass
+    over the deals (already unique by product_code), then a single sort,
+    highest discount first.
+    """
+    deals = list(deals_by_code.values())
+    tracked = itemgetter("original_price", "sale_price", "in_stock")
     for deal in deals:
-        code = deal["product_code"]
-        prev = previous_lookup.get(code)
+        prev = previous_lookup.get(deal["product_code"])
 
         if prev is None:
             # New item
             deal["last_updated"] = scraped_date
-        elif (
-            deal["original_price"] != prev.get("original_price")
-            or deal["sale_price"] != prev.get("sale_price")
-            or deal["in_stock"] != prev.get("in_stock")
-        ):
+            continue
+
+        prev_get = prev.get
+        if tracked(deal) != (prev_get("original_price"), prev_get("sale_price"), prev_get("in_stock")):
             # Data changed
             deal["last_updated"] = scraped_date
         else:
             # Unchanged — carry over previous last_updated
-            deal["last_updated"] = prev.get("last_updated", prev.get("scraped_date", scraped_date))
+            deal["last_updated"] = prev_get("last_updated", prev_get("scraped_date", scraped_date))
 
+    deals.sort(key=itemgetter("discount_pct"), reverse=True)
     return deals
 
 
+# SHA-256 of the last body successfully PUT to R2 in this process
+_last_uploaded_sha256: str | None = None
+
+
 def upload_to_r2(deals: list[dict]):
-    """Upload deals.json to Cloudflare R2 via boto3. Skips silently if not configured."""
+    """Upload deals.json to Cloudflare R2 via boto3. Skips silently if not configured.
+
+    The upload is also skipped when the body is byte-identical to the last
+    one uploaded, e.g. a checkpoint after a category that added no deals.
+    """
+    global _last_uploaded_sha256
     if boto3 is None:
         log.debug("boto3 not installed, skipping R2 upload")
         return
@@ -273,6 +393,12 @@ def upload_to_r2(deals: list[dict]):
         log.debug("R2 credentials not configured, skipping upload")
         return
 
+    body = orjson.dumps(deals)
+    body_sha256 = hashlib.sha256(body).hexdigest()
+    if body_sha256 == _last_uploaded_sha256:
+        log.info("deals.json unchanged since last upload, skipping R2 upload")
+        return
+
     try:
         s3 = boto3.client(
             "s3",
@@ -280,110 +406,147 @@ def upload_to_r2(deals: list[dict]):
             aws_access_key_id=access_key,
             aws_secret_access_key=secret_key,
         )
-        body = json.dumps(deals, ensure_ascii=False, indent=2).encode("utf-8")
         s3.put_object(
             Bucket=bucket,
             Key="deals.json",
             Body=body,
             ContentType="application/json",
         )
+        _last_uploaded_sha256 = body_sha256
         log.info(f"Uploaded {len(deals)} deals to R2 ({len(body)} bytes)")
     except Exception as e:
         log.warning(f"R2 upload failed (non-fatal): {e}")
 
 
+def collect_new_deals(
+    products: list[dict],
+    category_key: str,
+    scraped_date: str,
+    deals_by_code: dict[str, dict],
+) -> list[dict]:
+    """Process a page of raw products and return the deals not seen before.
+
+    New deals are also inserted into deals_by_code. Products without a
+    discount or a product_code, or already collected from another page or
+    category, are dropped.
+    """
+    setdefault = deals_by_code.setdefault
+    # setdefault returns the stored deal, which is this one only if it is new
+    return [
+        deal
+        for deal in filter(None, (process_product(p, category_key, scraped_date) for p in products))
+        if deal["product_code"] and setdefault(deal["product_code"], deal) is deal
+    ]
+
+
 async def fetch_and_process_page(
-    api_context,
+    client,
     category_key: str,
     query: str,
     page_num: int,
     scraped_date: str,
-    label: str
-) -> list[dict] | None:
+    label: str,
+    deals_by_code: dict[str, dict],
+) -> tuple[list[dict], int | None]:
     """Fetch one page and process products immediately.
 
+    New deals are added to deals_by_code; deals whose product_code is
+    already there (or missing) are dropped.
+
     Returns:
-        list of deals (may be empty if no products had discounts),
-        or None if the page had no products (signals end of data).
+        (deals, raw_count): the deals found on the page (may be empty if no
+        products had discounts) and the number of products the API returned.
+        raw_count is 0 for an empty page (signals end of data) and None if
+        the request failed.
     """
     try:
-        resp = await api_context.post(
-            CATE_SEARCH_API_URL,
-            params={
-                "query": query,
-                "currentPage": str(page_num),
-                "pageSize": str(PAGE_SIZE),
-            },
-            timeout=API_TIMEOUT,
-        )
+        resp = await api_post(client, query, page_num, label)
     except Exception as e:
         log.warning("[%s] API request failed on page %d: %s", label, page_num, e)
-        return []
+        return [], None
 
-    if resp.status != 200:
-        log.warning("[%s] API returned status %d on page %d", label, resp.status, page_num)
-        return []
+    if resp.status_code != 200:
+        log.warning("[%s] API returned status %d on page %d", label, resp.status_code, page_num)
+        return [], None
 
-    data = await resp.json()
+    try:
+        data = orjson.loads(resp.content)
+    except orjson.JSONDecodeError as e:
+        log.warning("[%s] Invalid JSON on page %d: %s", label, page_num, e)
+        return [], None
     products = data.get("products", [])
 
     if not products:
         # Truly empty page — signals end of data
-        return None
+        return [], 0
 
     # Process each product immediately
-    deals = []
-    for product in products:
-        _normalize_product(product)
-        product["_category"] = category_key
-
-        deal = process_product(product, scraped_date)
-        if deal:  # Only keep products with discounts
-            deals.append(deal)
-
-    return deals
+    return collect_new_deals(products, category_key, scraped_date, deals_by_code), len(products)
 
 
 async def scrape_and_process_category(
-    api_context,
+    client,
     category_key: str,
     category_info: dict,
     scraped_date: str,
-    all_deals: list[dict] | None = None,
+    deals_by_code: dict[str, dict] | None = None,
     on_batch=None,
+    journal: BinaryIO | None = None,
+    done_pages: set[int] | None = None,
+    failed_pages: set[int] | None = None,
 ) -> list[dict]:
     """Scrape all pages for a category, processing each page immediately.
 
     Args:
-        all_deals: Shared accumulator list. New deals are appended here so that
-                   on_batch callbacks can flush *all* deals collected so far
-                   (across categories).
+        deals_by_code: Shared accumulator of every deal collected so far,
+                       keyed by product_code (across categories). New deals
+                       are inserted as soon as they are processed, so
+                       duplicates are dropped on arrival and on_batch
+                       callbacks can flush everything collected so far.
         on_batch: Optional callback called every UPLOAD_BATCH_SIZE pages
                   for intermediate writes/uploads.
+        journal: Optional binary file each new deal is appended to as one
+                 JSON line as soon as its page is processed.
+        done_pages: Pages (from 1) already journaled by an interrupted
+                    earlier run; they are not fetched again. Pages
+                    completed by this call are added to it. Page 0 is
+                    always fetched for the page count.
+        failed_pages: Pages (page 0 included) whose request failed in
+                      this call are added here, so the caller knows the
+                      run is incomplete.
 
     Returns list of deals found in this category.
     """
     label = category_info["label"]
     query = category_info["query"]
     category_deals = []
+    if deals_by_code is None:
+        deals_by_code = {}
+    if done_pages is None:
+        done_pages = set()
+    if failed_pages is None:
+        failed_pages = set()
 
     # --- Page 0: Get total pages and first batch ---
     log.info("[%s] Fetching page 0...", label)
     try:
-        resp = await api_context.post(
-            CATE_SEARCH_API_URL,
-            params={"query": query, "currentPage": "0", "pageSize": str(PAGE_SIZE)},
-            timeout=API_TIMEOUT,
-        )
+        resp = await api_post(client, query, 0, label)
     except Exception as e:
         log.error("[%s] API request failed on page 0: %s", label, e)
+        failed_pages.add(0)
         return category_deals
 
-    if resp.status != 200:
-        log.error("[%s] API returned status %d on page 0", label, resp.status)
+    if resp.status_code != 200:
+        log.error("[%s] API returned status %d on page 0", label, resp.status_code)
+        failed_pages.add(0)
         return category_deals
 
-    data = await resp.json()
+    try:
+        data = orjson.loads(resp.content)
+    except orjson.JSONDecodeError as e:
+        log.error("[%s] Invalid JSON on page 0: %s", label, e)
+        failed_pages.add(0)
+        return category_deals
     pagination = data.get("pagination", {})
     total_pages = pagination.get("numberOfPages", 1)
     total_results = pagination.get("totalNumberOfResults", 0)
@@ -391,70 +554,66 @@ async def scrape_and_process_category(
 
     # Process page 0 products
     products = data.get("products", [])
-    for product in products:
-        _normalize_product(product)
-        product["_category"] = category_key
-        deal = process_product(product, scraped_date)
-        if deal:
-            category_deals.append(deal)
-            if all_deals is not None:
-                all_deals.append(deal)
+    category_deals.extend(collect_new_deals(products, category_key, scraped_date, deals_by_code))
+    if journal is not None:
+        journal.writelines(orjson.dumps(d, option=orjson.OPT_APPEND_NEWLINE) for d in category_deals)
 
     log.info("[%s] Page 0: processed %d deals from %d products", label, len(category_deals), len(products))
 
-    # --- Remaining pages ---
+    # --- Remaining pages (sliding window, paced by the global rate limiter) ---
     pages_to_scrape = min(total_pages, MAX_PAGES)
-    for page_num in range(1, pages_to_scrape):
-        await asyncio.sleep(REQUEST_DELAY)
-
-        log.info("[%s] Fetching page %d/%d...", label, page_num, pages_to_scrape - 1)
-
-        page_deals = await fetch_and_process_page(
-            api_context, category_key, query, page_num, scraped_date, label
-        )
-
-        if page_deals is None:
+    page_sem = asyncio.Semaphore(PAGE_CONCURRENCY)
+    stop_at = pages_to_scrape  # first page found empty; later pages are not started
+    pages_done = 0
+
+    async def fetch_page(page_num: int):
+        nonlocal stop_at, pages_done
+        if page_num in done_pages:
+            return
+        async with page_sem:
+            if page_num >= stop_at:
+                return
+            log.info("[%s] Fetching page %d/%d...", label, page_num, pages_to_scrape - 1)
+
+            page_deals, raw_count = await fetch_and_process_page(
+                client, category_key, query, page_num, scraped_date, label, deals_by_code
+            )
+
+        if raw_count == 0:
             # API returned no products — end of data
             log.info("[%s] No more products at page %d, stopping", label, page_num)
-            break
+            stop_at = min(stop_at, page_num)
+            return
 
         category_deals.extend(page_deals)
-        if all_deals is not None:
-            all_deals.extend(page_deals)
+        if journal is not None:
+            journal.writelines(orjson.dumps(d, option=orjson.OPT_APPEND_NEWLINE) for d in page_deals)
+        if raw_count is None:
+            failed_pages.add(page_num)
+        else:
+            done_pages.add(page_num)
+        pages_done += 1
         log.info(
             "[%s] Page %d: processed %d deals (total: %d)",
             label, page_num, len(page_deals), len(category_deals)
         )
 
         # Intermediate upload every UPLOAD_BATCH_SIZE pages
-        if on_batch and (page_num % UPLOAD_BATCH_SIZE == 0):
-            log.info("[%s] Batch checkpoint at page %d", label, page_num)
+        if on_batch and (pages_done % UPLOAD_BATCH_SIZE == 0):
+            log.info("[%s] Batch checkpoint after %d pages", label, pages_done)
             on_batch()
 
-    return category_deals
-
+    await asyncio.gather(*(fetch_page(n) for n in range(1, pages_to_scrape)))
 
-def deduplicate_and_sort(deals: list[dict]) -> list[dict]:
-    """Global deduplication by product_code, sort by discount."""
-    seen_codes = set()
-    deduplicated = []
-
-    for deal in deals:
-        code = deal["product_code"]
-        if code and code in seen_codes:
-            continue
-        if code:
-            seen_codes.add(code)
-        deduplicated.append(deal)
-
-    deduplicated.sort(key=lambda d: d["discount_pct"], reverse=True)
+    return category_deals
 
-    log.info(f"Deduplicated {len(deals)} → {len(deduplicated)} unique deals")
-    return deduplicated
 
+async def run_streaming_processor(pretty: bool = False):
+    """Main entry point: scrape → process → deduplicate → write.
 
-async def run_streaming_processor():
-    """Main entry point: scrape → process → deduplicate → write."""
+    Args:
+        pretty: Write deals.json indented for reading instead of compact.
+    """
     # Capture scraped date once at start for consistency
     scraped_date = date.today().isoformat()
     log.info(f"Starting streaming processor (scraped_date: {scraped_date})")
@@ -471,69 +630,159 @@ async def run_streaming_processor():
         active_categories = CATEGORIES
     log.info(f"Scraping categories: {list(active_categories.keys())} (SCRAPE_CATEGORY={SCRAPE_CATEGORY!r})")
 
-    all_deals = []
+    deals_by_code: dict[str, dict] = {}  # every unique deal, across all categories
+    done_pages: dict[str, set[int]] = {}  # category_key -> pages already journaled
+    failed_pages: dict[str, set[int]] = {}  # category_key -> pages that failed this run
     failed_categories = []
 
-    async with async_playwright() as pw:
-        api_context = await pw.request.new_context(
-            extra_http_headers={
-                "User-Agent": (
-                    "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) "
-                    "AppleWebKit/537.36 (KHTML, like Gecko) "
-                    "Chrome/120.0.0.0 Safari/537.36"
-                ),
-                "Accept": "application/json, text/plain, */*",
-                "Origin": "https://www.hktvmall.com",
-                "Referer": "https://www.hktvmall.com/",
-            }
+    # Pick up where an interrupted run from today left off
+    checkpoint = load_checkpoint(scraped_date)
+    if checkpoint is not None:
+        try:
+            deals_by_code = load_journal()
+        except (OSError, orjson.JSONDecodeError, KeyError) as e:
+            log.warning(f"Could not reload deals journal, starting fresh: {e}")
+            checkpoint = None
+    if checkpoint is not None:
+        done_pages = {k: set(v) for k, v in checkpoint["pages"].items()}
+        log.info(
+            f"Resuming: {len(deals_by_code)} deals from journal, "
+            f"{sum(map(len, done_pages.values()))} pages already done"
         )
 
-        def flush_intermediate():
-            """Deduplicate, apply last_updated, write locally, upload to R2."""
-            intermediate = deduplicate_and_sort(list(all_deals))
-            apply_last_updated(intermediate, previous_lookup, scraped_date)
-            atomic_write_json(DEALS_PATH, intermediate)
-            upload_to_r2(intermediate)
-
-        for cat_key, cat_info in active_categories.items():
-            try:
-                deals = await scrape_and_process_category(
-                    api_context, cat_key, cat_info, scraped_date,
-                    all_deals=all_deals,
-                    on_batch=flush_intermediate,
-                )
-                log.info(f"[{cat_info['label']}] Completed: {len(deals)} deals")
-
-                # Upload after each category completes too
-                flush_intermediate()
-            except Exception as e:
-                log.error(f"[{cat_info['label']}] Failed: {e}", exc_info=True)
-                failed_categories.append(cat_key)
-
-        await api_context.dispose()
-
-    if not all_deals:
+    client = get_client()
+
+    last_flush = time.monotonic()
+    pending_checkpoint: asyncio.Task | None = None
+
+    def write_and_upload(deals: list[dict]):
+        """Write and upload an intermediate snapshot (runs in a worker thread)."""
+        try:
+            atomic_write_json(DEALS_PATH, deals, pretty)
+        except Exception as e:
+            log.warning(f"Intermediate write failed (non-fatal): {e}")
+            return
+        upload_to_r2(deals)
+
+    def flush_intermediate():
+        """Sort, apply last_updated, write locally, upload to R2.
+
+        Skipped if the last checkpoint was under CHECKPOINT_INTERVAL seconds
+        ago, so the growing deal list is not rewritten and re-uploaded at
+        every batch and category. The final write always happens.
+
+        The write and upload run in a worker thread so page fetches keep
+        going meanwhile. Only one runs at a time: while the previous one
+        is still in flight this checkpoint is skipped, never queued, so an
+        older snapshot cannot land after a newer one.
+        """
+        nonlocal last_flush, pending_checkpoint
+        # The resume checkpoint is tiny, so it is saved every time; the
+        # journal is flushed first so it never lags the pages it lists.
+        journal.flush()
+        save_checkpoint(scraped_date, done_pages)
+
+        now = time.monotonic()
+        if now - last_flush < CHECKPOINT_INTERVAL:
+            return
+        if pending_checkpoint is not None and not pending_checkpoint.done():
+            log.info("Previous checkpoint still being written, skipping this one")
+            return
+        last_flush = now
+
+        intermediate = finalize(deals_by_code, previous_lookup, scraped_date)
+        pending_checkpoint = asyncio.create_task(asyncio.to_thread(write_and_upload, intermediate))
+
+    category_sem = asyncio.Semaphore(CATEGORY_CONCURRENCY)
+
+    async def run_category(cat_key: str, cat_info: dict) -> list[dict]:
+        async with category_sem:
+            deals = await scrape_and_process_category(
+                client, cat_key, cat_info, scraped_date,
+                deals_by_code=deals_by_code,
+                on_batch=flush_intermediate,
+                journal=journal,
+                done_pages=done_pages.setdefault(cat_key, set()),
+                failed_pages=failed_pages.setdefault(cat_key, set()),
+            )
+        log.info(f"[{cat_info['label']}] Completed: {len(deals)} deals")
+
+        # Upload after each category completes too
+        flush_intermediate()
+        return deals
+
+    # Categories run concurrently; the shared rate limiter keeps the
+    # overall request rate unchanged. New deals are also journaled as they
+    # arrive, so a crashed run leaves everything it collected on disk.
+    DEALS_JOURNAL_PATH.parent.mkdir(parents=True, exist_ok=True)
+    with open(DEALS_JOURNAL_PATH, "ab" if checkpoint is not None else "wb") as journal:
+        try:
+            results = await asyncio.gather(
+                *(run_category(k, v) for k, v in active_categories.items()),
+                return_exceptions=True,
+            )
+        finally:
+            # Also reached on cancellation/interrupt, so a rerun can resume
+            journal.flush()
+            save_checkpoint(scraped_date, done_pages)
+    for (cat_key, cat_info), result in zip(active_categories.items(), results):
+        if isinstance(result, BaseException):
+            log.error(f"[{cat_info['label']}] Failed: {result}", exc_info=result)
+            failed_categories.append(cat_key)
+
+    # Let the last intermediate write/upload finish before the final one starts
+    if pending_checkpoint is not None:
+        await pending_checkpoint
+
+    if not deals_by_code:
         log.error("No deals collected from any category")
         return []
 
-    # Final deduplication, last_updated, and write
-    final_deals = deduplicate_and_sort(all_deals)
-    apply_last_updated(final_deals, previous_lookup, scraped_date)
+    # Final sort, last_updated, and write (deals are already unique)
+    final_deals = finalize(deals_by_code, previous_lookup, scraped_date)
     log.info(f"Total unique deals: {len(final_deals)}")
 
-    atomic_write_json(DEALS_PATH, final_deals)
+    atomic_write_json(DEALS_PATH, final_deals, pretty, verify=True)
     save_last_updated_state(final_deals)
-    upload_to_r2(final_deals)
-
-    if failed_categories:
-        log.warning(f"Partial success. Failed categories: {failed_categories}")
+    await asyncio.to_thread(upload_to_r2, final_deals)
+
+    incomplete_pages = {k: sorted(v) for k, v in failed_pages.items() if v}
+    if failed_categories or incomplete_pages:
+        # Keep the journal and checkpoint so a same-day rerun only fetches
+        # the failed categories and pages
+        log.warning(
+            f"Partial success. Failed categories: {failed_categories}, "
+            f"failed pages: {incomplete_pages}. Resume state kept for a rerun."
+        )
+    else:
+        DEALS_JOURNAL_PATH.unlink(missing_ok=True)  # superseded by deals.json
+        SCRAPE_CHECKPOINT_PATH.unlink(missing_ok=True)
 
     return final_deals
 
 
+async def _run_and_close(pretty: bool = False):
+    """Run the processor, then close the shared HTTP client."""
+    try:
+        return await run_streaming_processor(pretty)
+    finally:
+        await close_client()
+
+
 def main():
-    """CLI entry point."""
-    asyncio.run(run_streaming_processor())
+    """CLI entry point. Runs on uvloop's event loop when it is installed."""
+    parser = argparse.ArgumentParser(description="Scrape HKTVmall and write deals.json")
+    parser.add_argument(
+        "--pretty",
+        action="store_true",
+        help="indent deals.json for human reading (default: compact)",
+    )
+    args = parser.parse_args()
+
+    if uvloop is not None:
+        uvloop.run(_run_and_close(args.pretty))
+    else:
+        asyncio.run(_run_and_close(args.pretty))
 
 
 if __name__ == "__main__":
@@ -16,6 +16,7 @@ import os
 import sys
 import urllib.request
 from datetime import date
+from operator import itemgetter
 
 from src.config import DEALS_PATH
 
@@ -132,7 +133,7 @@ def filter_deals_for_user(deals, filters):
         matched.append(d)
 
     # Sort by discount desc, take top max_deals
-    matched.sort(key=lambda x: x["discount_pct"], reverse=True)
+    matched.sort(key=itemgetter("discount_pct"), reverse=True)
     return matched[:max_deals]
 
 